@@ -3,70 +3,181 @@ os.environ["SETUPTOOLS_SCM_PRETEND_VERSION_FOR_PYQLIB"] = os.environ.get(
     "SETUPTOOLS_SCM_PRETEND_VERSION_FOR_PYQLIB", "0.0"
 )
 os.environ.setdefault("SETUPTOOLS_SCM_PRETEND_VERSION", "0.0")
+import functools
+import hashlib
 import importlib
+import mmap
 import pickle
+import time
 from pathlib import Path
-from typing import Dict, Optional
+from typing import TYPE_CHECKING, Dict, Optional, Set
 
-import mlflow
+import numpy as np
 import pandas as pd
-import plotly.express as px
 import streamlit as st
 
+# mlflow, plotly and pyarrow are imported inside the functions that use them, so
+# each loads only when a client, chart or artifact is first needed.
+if TYPE_CHECKING:
+    import mlflow
+    import plotly.graph_objects as go
+
 
 BASE_DIR = Path(__file__).resolve().parents[1]
 DEFAULT_MLRUNS_DIR = BASE_DIR / "qlib" / "mlruns"
-
-_QLIB_READY: Optional[bool] = None
+# Run listings are cached here, outside the tracking root, where MLflow would
+# mistake any extra folder for an experiment.
+RUNS_CACHE_DIR = Path(os.environ.get("QUANTBOT_CACHE_DIR", Path.home() / ".cache" / "quantbot")) / "runs"
+# Cached listings older than this are rebuilt, so deleted or resumed runs eventually show up.
+RUNS_CACHE_MAX_AGE_SECONDS = 24 * 60 * 60
+# Set QUANTBOT_FEATHER_CACHE=0 when the tracking directory is read-only.
+WRITE_FEATHER_CACHE = os.environ.get("QUANTBOT_FEATHER_CACHE", "1") != "0"
+# Pickles larger than this are memory-mapped instead of read into a bytes copy.
+MMAP_THRESHOLD_BYTES = 64 * 1024 * 1024
+# Line charts are reduced to roughly this many points per series before plotting.
+MAX_CHART_POINTS = 2000
+HISTOGRAM_BINS = 40
+
+
+@functools.lru_cache(maxsize=None)
+def _import_qlib():
+    # Failed imports raise and are therefore not cached, so later sessions retry.
+    qlib_module = importlib.import_module("qlib")
+    if not hasattr(qlib_module, "__version__"):
+        qlib_module.__version__ = "0.0"
+    return qlib_module
 
 
 def ensure_qlib_ready() -> bool:
-    global _QLIB_READY
-    if _QLIB_READY:
-        return True
     try:
-        qlib_module = importlib.import_module("qlib")
-        if not hasattr(qlib_module, "__version__"):
-            qlib_module.__version__ = "0.0"
-        _QLIB_READY = True
+        _import_qlib()
         return True
     except Exception as err:
         st.warning(f"Unable to import qlib for artifact deserialization: {err}")
-        _QLIB_READY = False
         return False
 
 
 @st.cache_resource(show_spinner=False)
-def get_client(tracking_dir: Path) -> mlflow.tracking.MlflowClient:
-    tracking_uri = tracking_dir.resolve().as_uri()
+def get_client(tracking_uri: str) -> "mlflow.tracking.MlflowClient":
+    import mlflow
+
     return mlflow.tracking.MlflowClient(tracking_uri=tracking_uri)
 
 
 @st.cache_data(show_spinner=False)
-def list_experiments(_client: mlflow.tracking.MlflowClient) -> Dict[str, str]:
-    experiments = _client.search_experiments()
+def list_experiments(tracking_uri: str) -> Dict[str, str]:
+    experiments = get_client(tracking_uri).search_experiments()
     return {exp.name: exp.experiment_id for exp in experiments}
 
 
-@st.cache_data(show_spinner=False)
-def list_runs(_client: mlflow.tracking.MlflowClient, experiment_id: str) -> pd.DataFrame:
-    runs = _client.search_runs(experiment_ids=[experiment_id], order_by=["attributes.start_time DESC"])
+_SEARCH_PAGE_SIZE = 1000
+_RUN_ORDER_BY = ["attributes.start_time DESC"]
+# Runs in these states can still change, so listings containing them are not persisted.
+_UNFINISHED_STATUSES = {"RUNNING", "SCHEDULED"}
+
+# Only these params/metrics are kept per run, so the listing stays narrow; they
+# are what the sidebar's "Run metrics" table shows for the selected run.
+_DISPLAY_PARAMS: Set[str] = set()
+_DISPLAY_METRICS: Set[str] = {
+    "IC",
+    "ICIR",
+    "Rank IC",
+    "Rank ICIR",
+    "1day.excess_return_with_cost.annualized_return",
+    "1day.excess_return_with_cost.information_ratio",
+    "1day.excess_return_with_cost.max_drawdown",
+}
+
+
+def _run_columns(runs) -> Dict[str, object]:
+    """Assemble the run listing column-wise instead of one dict per run."""
+    n_runs = len(runs)
+    start_ms = np.empty(n_runs, dtype=np.int64)
+    end_ms: list[Optional[int]] = [None] * n_runs
+    columns: Dict[str, object] = {
+        "run_id": [None] * n_runs,
+        "start_time": None,
+        "end_time": None,
+        "status": [None] * n_runs,
+    }
+    for i, run in enumerate(runs):
+        info = run.info
+        columns["run_id"][i] = info.run_id
+        start_ms[i] = info.start_time
+        end_ms[i] = info.end_time or None
+        columns["status"][i] = info.status
+        for source, allowed in ((run.data.params, _DISPLAY_PARAMS), (run.data.metrics, _DISPLAY_METRICS)):
+            for key, value in source.items():
+                if key in allowed:
+                    if key not in columns:
+                        columns[key] = [None] * n_runs
+                    columns[key][i] = value
+    # One vectorized conversion per column instead of a Timestamp per run.
+    columns["start_time"] = pd.to_datetime(start_ms, unit="ms")
+    columns["end_time"] = pd.to_datetime(pd.array(end_ms, dtype="Int64"), unit="ms")
+    return columns
+
+
+def _runs_cache_path(tracking_uri: str, experiment_id: str, latest: int) -> Path:
+    store_key = hashlib.sha1(tracking_uri.encode("utf-8")).hexdigest()[:16]
+    # Editing the column whitelists changes the file name and so invalidates old listings.
+    columns = "\0".join(sorted(_DISPLAY_PARAMS)) + "\1" + "\0".join(sorted(_DISPLAY_METRICS))
+    columns_key = hashlib.sha1(columns.encode("utf-8")).hexdigest()[:8]
+    return RUNS_CACHE_DIR / store_key / f"runs_{experiment_id}_{latest}_{columns_key}.parquet"
+
+
+def _runs_cache_is_fresh(cache_path: Path) -> bool:
+    try:
+        age = time.time() - cache_path.stat().st_mtime
+    except FileNotFoundError:
+        return False
+    return age < RUNS_CACHE_MAX_AGE_SECONDS
+
+
+@st.cache_data(show_spinner=False, ttl=300)
+def list_runs(tracking_uri: str, experiment_id: str) -> pd.DataFrame:
+    client = get_client(tracking_uri)
+    newest = client.search_runs(
+        experiment_ids=[experiment_id], max_results=1, order_by=_RUN_ORDER_BY
+    )
+    if not newest:
+        return pd.DataFrame()
+    # The newest start_time is baked into the file name, so a new run invalidates the cache.
+    cache_path = _runs_cache_path(tracking_uri, experiment_id, newest[0].info.start_time)
+    if _runs_cache_is_fresh(cache_path):
+        try:
+            return pd.read_parquet(cache_path)
+        except Exception:
+            pass
+
+    runs = []
+    token = None
+    while True:
+        page = client.search_runs(
+            experiment_ids=[experiment_id],
+            max_results=_SEARCH_PAGE_SIZE,
+            order_by=_RUN_ORDER_BY,
+            page_token=token,
+        )
+        runs.extend(page)
+        token = page.token
+        if not token:
+            break
     if not runs:
         return pd.DataFrame()
-    records = []
-    for run in runs:
-        info = run.info
-        data = {
-            "run_id": info.run_id,
-            "start_time": pd.to_datetime(info.start_time, unit="ms"),
-            "end_time": pd.to_datetime(info.end_time, unit="ms") if info.end_time else None,
-            "status": info.status,
-        }
-        data.update(run.data.params)
-        for key, value in run.data.metrics.items():
-            data[key] = value
-        records.append(data)
-    return pd.DataFrame(records)
+    df = pd.DataFrame(_run_columns(runs))
+    if df["status"].isin(_UNFINISHED_STATUSES).any():
+        return df
+
+    try:
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        for stale in cache_path.parent.glob(f"runs_{experiment_id}_*.parquet"):
+            stale.unlink()
+        df.to_parquet(cache_path, engine="pyarrow", compression="zstd")
+    except Exception:
+        # Caching is best-effort; an unwritable cache dir still works.
+        pass
+    return df
 
 
 def get_run_artifact_path(tracking_dir: Path, experiment_id: str, run_id: str, relative_path: str) -> Path:
@@ -74,66 +185,159 @@ def get_run_artifact_path(tracking_dir: Path, experiment_id: str, run_id: str, r
     return run_dir / relative_path
 
 
-def load_pickle(path: Path, *, require_qlib: bool = False) -> Optional[object]:
-    if not path.exists():
+def _read_pickle(path: Path) -> object:
+    # One large read beats pickle.load's buffered stream of small reads.
+    if path.stat().st_size <= MMAP_THRESHOLD_BYTES:
+        return pickle.loads(path.read_bytes())
+    with path.open("rb") as fp, mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        return pickle.loads(mm)
+
+
+@st.cache_resource(show_spinner=False, max_entries=64)
+def _load_artifact_cached(path_str: str, mtime_ns: int) -> object:
+    # mtime_ns only feeds the cache key, so rewriting the pickle invalidates the entry.
+    # Errors propagate so that only successful loads are memoized.
+    import pyarrow.feather as feather
+
+    path = Path(path_str)
+    feather_path = path.with_suffix(".feather")
+    if feather_path.exists() and feather_path.stat().st_mtime >= path.stat().st_mtime:
+        try:
+            return feather.read_feather(feather_path)
+        except Exception:
+            pass
+    obj = _read_pickle(path)
+    if WRITE_FEATHER_CACHE and isinstance(obj, pd.DataFrame):
+        try:
+            feather.write_feather(obj, feather_path, compression="uncompressed")
+        except Exception:
+            # Not every frame is Arrow-serializable; fall back to the pickle next time.
+            feather_path.unlink(missing_ok=True)
+    return obj
+
+
+def load_artifact(path: Path, *, require_qlib: bool = False) -> Optional[object]:
+    """Load a pickled artifact, preferring a sibling Feather copy for DataFrames.
+
+    Results are memoized per (path, mtime), so reruns on the same run are free.
+    Failures are not cached and are retried on the next call.
+    """
+    try:
+        mtime_ns = path.stat().st_mtime_ns
+    except FileNotFoundError:
         return None
     if require_qlib and not ensure_qlib_ready():
         return None
     try:
-        with path.open("rb") as fp:
-            return pickle.load(fp)
+        return _load_artifact_cached(str(path), mtime_ns)
     except Exception as err:
         st.warning(f"Failed to load {path.name}: {err}")
         return None
 
 
-def render_cumulative_chart(report_df: pd.DataFrame):
-    cumulative = report_df[["return", "bench"]].cumsum()
-    cumulative.columns = ["Strategy", "Benchmark"]
-    fig = px.line(
-        cumulative.reset_index(),
-        x="datetime",
-        y=["Strategy", "Benchmark"],
-        title="Cumulative Return",
-        labels={"value": "Cumulative Return", "datetime": "Date", "variable": "Series"},
+def _lttb_indices(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """Largest-Triangle-Three-Buckets: positions of the points to keep."""
+    n = len(y)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    y = np.nan_to_num(y)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    keep = np.empty(n_out, dtype=np.int64)
+    keep[0], keep[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        start, end = edges[i], edges[i + 1]
+        next_end = edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[end:next_end].mean()
+        avg_y = y[end:next_end].mean()
+        area = np.abs((x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + int(np.argmax(area))
+        keep[i + 1] = a
+    return keep
+
+
+def _downsample_positions(index: pd.Index, values: np.ndarray, n_out: int = MAX_CHART_POINTS) -> np.ndarray:
+    """Union of each column's LTTB points so every series keeps its shape."""
+    if len(index) <= n_out:
+        return np.arange(len(index))
+    if isinstance(index, pd.DatetimeIndex):
+        x = index.asi8.astype(np.float64)
+    else:
+        x = np.arange(len(index), dtype=np.float64)
+    return np.unique(np.concatenate([_lttb_indices(x, values[:, j], n_out) for j in range(values.shape[1])]))
+
+
+def _downsample(df: pd.DataFrame, n_out: int = MAX_CHART_POINTS) -> pd.DataFrame:
+    if len(df) <= n_out:
+        return df
+    return df.iloc[_downsample_positions(df.index, df.to_numpy(dtype=np.float64), n_out)]
+
+
+def _cumulative_line_figure(report_df: pd.DataFrame, columns, names, title: str, y_title: str) -> "go.Figure":
+    import plotly.graph_objects as go
+
+    values = report_df[columns].to_numpy(dtype=np.float64, copy=False)
+    # nancumsum treats gaps as zero, so a missing day plots the previous total where
+    # pandas cumsum() would leave a NaN hole in the line.
+    cumulative = np.nancumsum(values, axis=0, out=np.empty_like(values))
+    keep = _downsample_positions(report_df.index, cumulative)
+    x = report_df.index[keep]
+    fig = go.Figure(
+        [go.Scattergl(x=x, y=cumulative[keep, j], mode="lines", name=name) for j, name in enumerate(names)]
     )
+    fig.update_layout(title=title, xaxis_title="Date", yaxis_title=y_title, legend_title_text="Series")
+    return fig
+
+
+@st.cache_data(show_spinner=False, max_entries=64)
+def _cumulative_figure(report_path: str, mtime_ns: int, _report_df: pd.DataFrame) -> "go.Figure":
+    # Keyed on the artifact file, not the frame, so reused object ids cannot collide.
+    return _cumulative_line_figure(
+        _report_df, ["return", "bench"], ["Strategy", "Benchmark"], "Cumulative Return", "Cumulative Return"
+    )
+
+
+def render_cumulative_chart(report_df: pd.DataFrame, report_path: Path):
+    fig = _cumulative_figure(str(report_path), report_path.stat().st_mtime_ns, report_df)
     st.plotly_chart(fig, use_container_width=True)
 
 
 def render_daily_return_chart(report_df: pd.DataFrame):
+    import plotly.express as px
+    import plotly.graph_objects as go
+
     fig = px.line(
-        report_df.reset_index(),
+        _downsample(report_df[["return"]]).reset_index(),
         x="datetime",
         y="return",
         title="Daily Strategy Excess Return",
         labels={"return": "Excess Return", "datetime": "Date"},
+        render_mode="webgl",
     )
     st.plotly_chart(fig, use_container_width=True)
 
-    hist = px.histogram(
-        report_df,
-        x="return",
-        nbins=40,
+    # Bin in NumPy so only the bar heights are sent to the browser, not every sample.
+    counts, edges = np.histogram(report_df["return"].dropna().to_numpy(dtype=np.float64), bins=HISTOGRAM_BINS)
+    hist = go.Figure(go.Bar(x=0.5 * (edges[:-1] + edges[1:]), y=counts, width=np.diff(edges)))
+    hist.update_layout(
         title="Distribution of Daily Excess Returns",
-        labels={"return": "Excess Return"},
+        xaxis_title="Excess Return",
+        yaxis_title="count",
+        bargap=0,
     )
     st.plotly_chart(hist, use_container_width=True)
 
 
 def render_cost_chart(report_df: pd.DataFrame):
-    cost_df = report_df[["cost", "total_cost"]].cumsum()
-    cost_df.columns = ["Cost", "Total Cost"]
-    fig = px.line(
-        cost_df.reset_index(),
-        x="datetime",
-        y=["Cost", "Total Cost"],
-        title="Cumulative Trading Costs",
-        labels={"value": "Cost", "datetime": "Date", "variable": "Series"},
+    fig = _cumulative_line_figure(
+        report_df, ["cost", "total_cost"], ["Cost", "Total Cost"], "Cumulative Trading Costs", "Cost"
     )
     st.plotly_chart(fig, use_container_width=True)
 
 
 def render_turnover_chart(indicator):
+    import plotly.express as px
+
     turnover_series = None
     trade_indicator = getattr(indicator, "trade_indicator", None)
     if trade_indicator is not None:
@@ -149,6 +353,7 @@ def render_turnover_chart(indicator):
         y="turnover",
         title="Turnover Ratio",
         labels={"turnover": "Turnover", "datetime": "Date"},
+        render_mode="webgl",
     )
     st.plotly_chart(fig, use_container_width=True)
 
@@ -158,9 +363,9 @@ def render_run_details(tracking_dir: Path, experiment_id: str, run_id: str):
     summary_path = get_run_artifact_path(tracking_dir, experiment_id, run_id, "portfolio_analysis/port_analysis_1day.pkl")
     indicator_path = get_run_artifact_path(tracking_dir, experiment_id, run_id, "portfolio_analysis/indicators_normal_1day_obj.pkl")
 
-    report_df = load_pickle(report_path)
-    summary_df = load_pickle(summary_path)
-    indicator_obj = load_pickle(indicator_path, require_qlib=True)
+    report_df = load_artifact(report_path)
+    summary_df = load_artifact(summary_path)
+    indicator_obj = load_artifact(indicator_path, require_qlib=True)
 
     if report_df is None:
         st.warning("report_normal_1day.pkl not found for this run.")
@@ -168,8 +373,9 @@ def render_run_details(tracking_dir: Path, experiment_id: str, run_id: str):
 
     st.markdown(f"### Run {run_id}")
     cols = st.columns(3)
-    strategy_cum = report_df["return"].cumsum().iloc[-1]
-    bench_cum = report_df["bench"].cumsum().iloc[-1]
+    # Same NaN-skipping total as the last point of the nancumsum-based chart.
+    strategy_cum = np.nansum(report_df["return"].to_numpy(dtype=np.float64))
+    bench_cum = np.nansum(report_df["bench"].to_numpy(dtype=np.float64))
     cols[0].metric("Final Strategy Cumulative Return", f"{strategy_cum:.2%}")
     cols[1].metric("Final Benchmark Cumulative Return", f"{bench_cum:.2%}")
     if summary_df is not None:
@@ -189,7 +395,7 @@ def render_run_details(tracking_dir: Path, experiment_id: str, run_id: str):
         except Exception:
             pass
 
-    render_cumulative_chart(report_df)
+    render_cumulative_chart(report_df, report_path)
     render_daily_return_chart(report_df)
     render_cost_chart(report_df)
 
@@ -209,14 +415,15 @@ def main():
             value=str(DEFAULT_MLRUNS_DIR),
             help="Path to the mlruns folder."
         )
-        tracking_dir = Path(tracking_dir_input).expanduser()
+        # Resolve once per rerun; caches below key on the resulting strings.
+        tracking_dir = Path(tracking_dir_input).expanduser().resolve()
 
     if not tracking_dir.exists():
         st.error("Tracking directory does not exist. Update the path in the sidebar.")
         return
 
-    client = get_client(tracking_dir)
-    experiments = list_experiments(client)
+    tracking_uri = tracking_dir.as_uri()
+    experiments = list_experiments(tracking_uri)
     if not experiments:
         st.info("No MLflow experiments found in this tracking directory.")
         return
@@ -224,7 +431,7 @@ def main():
     experiment_name = st.sidebar.selectbox("Experiment", sorted(experiments.keys()))
     experiment_id = experiments[experiment_name]
 
-    runs_df = list_runs(client, experiment_id)
+    runs_df = list_runs(tracking_uri, experiment_id)
     if runs_df.empty:
         st.info("No runs found for this experiment.")
         return
@@ -236,6 +443,11 @@ def main():
     selected_run = runs_df[runs_df["run_id"] == run_id].iloc[0]
     st.sidebar.markdown("**Run details**")
     st.sidebar.dataframe(selected_run[["start_time", "end_time", "status"]].to_frame().T)
+    display_cols = [col for col in runs_df.columns if col in _DISPLAY_PARAMS or col in _DISPLAY_METRICS]
+    run_values = selected_run[display_cols].dropna()
+    if not run_values.empty:
+        st.sidebar.markdown("**Run metrics**")
+        st.sidebar.dataframe(run_values.rename("value").to_frame())
 
     render_run_details(tracking_dir, experiment_id, run_id)
 
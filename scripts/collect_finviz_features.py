@@ -2,57 +2,72 @@
 
 Example usage:
     python scripts/collect_finviz_features.py --tickers AAPL,MSFT,TSLA
+    python scripts/collect_finviz_features.py --tickers-file sp500.txt
 
-This script snapshots cleaned numeric features into CSV files under
-`data_cache/finviz/` so they can be joined to Qlib pipelines later.
+This script snapshots cleaned numeric features into CSV and Parquet files
+under `data_cache/finviz/` so they can be joined to Qlib pipelines later.
+Install its dependencies with `pip install -r scripts/requirements.txt`.
+
+CSVs are written by pyarrow, which quotes the header and every string field
+(`"AAPL","Technology",...`), unlike older pandas-written snapshots. Both
+forms read back identically with `pd.read_csv`.
 """
 from __future__ import annotations
 
 import argparse
-import json
+import csv
+import itertools
+import mmap
+import sys
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
 from pathlib import Path
-from typing import Dict, Iterable, Tuple
+from typing import Dict, Iterable, Iterator, Tuple
 
+import orjson
 import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pac
+import pyarrow.parquet as pq
 from finvizfinance.quote import finvizfinance
 
 # Helper parsers -------------------------------------------------------------
+# These scalar parsers are public helpers for callers converting single values;
+# batch collection parses whole columns in `_parse_columns` instead.
 
+_NA_TOKENS = frozenset({"", "-", "NaN", "nan", "N/A", "None"})
+# str.translate deletes thousands separators in a single C-level pass.
+_STRIP_TABLE = str.maketrans("", "", ",")
 
-def parse_float(value: str | float | int | None) -> float | None:
+
+def _parse_number(value: str | float | int | None, *, percent: bool = False) -> float | None:
     if value is None:
         return None
-    text = str(value).strip()
-    if text in {"", "-", "NaN", "nan"}:
+    text = value.strip() if isinstance(value, str) else str(value).strip()
+    if text in _NA_TOKENS:
         return None
-    text = text.replace(",", "")
+    # Only a trailing "%" is accepted; one elsewhere makes float() reject the value.
+    if percent and text.endswith("%"):
+        text = text[:-1]
     try:
-        return float(text)
+        return float(text.translate(_STRIP_TABLE))
     except ValueError:
         return None
 
 
+def parse_float(value: str | float | int | None) -> float | None:
+    return _parse_number(value)
+
+
 def parse_percent(value: str | float | int | None) -> float | None:
-    if value is None:
-        return None
-    text = str(value).strip()
-    if text in {"", "-", "NaN", "nan"}:
-        return None
-    if text.endswith("%"):
-        text = text[:-1]
-    text = text.replace(",", "")
-    try:
-        return float(text)
-    except ValueError:
-        return None
+    return _parse_number(value, percent=True)
 
 
 def parse_high_low(value: str | None) -> Tuple[float | None, float | None]:
     if value is None:
         return None, None
-    text = str(value).strip()
-    if text in {"", "-", "NaN", "nan"}:
+    text = value.strip() if isinstance(value, str) else str(value).strip()
+    if text in _NA_TOKENS:
         return None, None
     parts = text.split()
     price = parse_float(parts[0]) if parts else None
@@ -62,39 +77,43 @@ def parse_high_low(value: str | None) -> Tuple[float | None, float | None]:
 
 # Field mapping --------------------------------------------------------------
 
-COMMON_FIELD_MAP: Dict[str, Tuple[str, callable]] = {
-    "Price": ("price", parse_float),
-    "Change": ("change_pct", parse_percent),
-    "P/E": ("pe", parse_float),
-    "Forward P/E": ("forward_pe", parse_float),
-    "PEG": ("peg", parse_float),
-    "EPS this Y": ("eps_growth_this_year_pct", parse_percent),
-    "EPS next Y": ("eps_next_year", parse_float),
-    "EPS next 5Y": ("eps_next_5y_pct", parse_percent),
-    "Sales Y/Y TTM": ("sales_yoy_ttm_pct", parse_percent),
-    "EPS Q/Q": ("eps_qoq_pct", parse_percent),
-    "Sales Q/Q": ("sales_qoq_pct", parse_percent),
-    "ROE": ("roe_pct", parse_percent),
-    "ROIC": ("roic_pct", parse_percent),
-    "Gross Margin": ("gross_margin_pct", parse_percent),
-    "Oper. Margin": ("oper_margin_pct", parse_percent),
-    "Profit Margin": ("profit_margin_pct", parse_percent),
-    "Debt/Eq": ("debt_to_equity", parse_float),
-    "LT Debt/Eq": ("lt_debt_to_equity", parse_float),
-    "Current Ratio": ("current_ratio", parse_float),
-    "Quick Ratio": ("quick_ratio", parse_float),
-    "Short Float": ("short_float_pct", parse_percent),
-    "Short Ratio": ("short_ratio", parse_float),
-    "Insider Own": ("insider_own_pct", parse_percent),
-    "Insider Trans": ("insider_trans_pct", parse_percent),
-    "Inst Own": ("institutional_own_pct", parse_percent),
-    "Inst Trans": ("institutional_trans_pct", parse_percent),
-    "Perf Week": ("perf_week_pct", parse_percent),
-    "Perf Month": ("perf_month_pct", parse_percent),
-    "SMA20": ("sma20_pct", parse_percent),
-    "SMA50": ("sma50_pct", parse_percent),
-    "SMA200": ("sma200_pct", parse_percent),
-    "RSI (14)": ("rsi_14", parse_float),
+FLOAT = "float"
+PERCENT = "percent"
+
+# Finviz field -> (output column, value kind).
+COMMON_FIELD_MAP: Dict[str, Tuple[str, str]] = {
+    "Price": ("price", FLOAT),
+    "Change": ("change_pct", PERCENT),
+    "P/E": ("pe", FLOAT),
+    "Forward P/E": ("forward_pe", FLOAT),
+    "PEG": ("peg", FLOAT),
+    "EPS this Y": ("eps_growth_this_year_pct", PERCENT),
+    "EPS next Y": ("eps_next_year", FLOAT),
+    "EPS next 5Y": ("eps_next_5y_pct", PERCENT),
+    "Sales Y/Y TTM": ("sales_yoy_ttm_pct", PERCENT),
+    "EPS Q/Q": ("eps_qoq_pct", PERCENT),
+    "Sales Q/Q": ("sales_qoq_pct", PERCENT),
+    "ROE": ("roe_pct", PERCENT),
+    "ROIC": ("roic_pct", PERCENT),
+    "Gross Margin": ("gross_margin_pct", PERCENT),
+    "Oper. Margin": ("oper_margin_pct", PERCENT),
+    "Profit Margin": ("profit_margin_pct", PERCENT),
+    "Debt/Eq": ("debt_to_equity", FLOAT),
+    "LT Debt/Eq": ("lt_debt_to_equity", FLOAT),
+    "Current Ratio": ("current_ratio", FLOAT),
+    "Quick Ratio": ("quick_ratio", FLOAT),
+    "Short Float": ("short_float_pct", PERCENT),
+    "Short Ratio": ("short_ratio", FLOAT),
+    "Insider Own": ("insider_own_pct", PERCENT),
+    "Insider Trans": ("insider_trans_pct", PERCENT),
+    "Inst Own": ("institutional_own_pct", PERCENT),
+    "Inst Trans": ("institutional_trans_pct", PERCENT),
+    "Perf Week": ("perf_week_pct", PERCENT),
+    "Perf Month": ("perf_month_pct", PERCENT),
+    "SMA20": ("sma20_pct", PERCENT),
+    "SMA50": ("sma50_pct", PERCENT),
+    "SMA200": ("sma200_pct", PERCENT),
+    "RSI (14)": ("rsi_14", FLOAT),
 }
 
 HIGH_LOW_FIELDS = {
@@ -102,34 +121,137 @@ HIGH_LOW_FIELDS = {
     "52W Low": ("52w_low_price", "52w_low_distance_pct"),
 }
 
+# Flattened once so the per-ticker loop avoids re-walking the dict items.
+_FIELD_ITEMS = tuple((field, col, kind) for field, (col, kind) in COMMON_FIELD_MAP.items())
+_HL_ITEMS = tuple((field, price_col, distance_col) for field, (price_col, distance_col) in HIGH_LOW_FIELDS.items())
+_NUMERIC_COLUMNS = [col for _, col, _ in _FIELD_ITEMS] + [
+    col for _, price_col, distance_col in _HL_ITEMS for col in (price_col, distance_col)
+]
+
+
+MAX_WORKERS = 32
+
+
+def _empty_row(ticker: str) -> Dict[str, str | None]:
+    row: Dict[str, str | None] = {
+        "ticker": ticker.upper(),
+        "sector": None,
+        "industry": None,
+        "country": None,
+    }
+    for _, col, _ in _FIELD_ITEMS:
+        row[col] = None
+    for _, price_col, distance_col in _HL_ITEMS:
+        row[price_col] = None
+        row[distance_col] = None
+    return row
+
 
-def collect_quote_features(tickers: Iterable[str]) -> pd.DataFrame:
-    rows = []
-    for ticker in tickers:
-        stock = finvizfinance(ticker)
-        fundament = stock.ticker_fundament()
-        row: Dict[str, float | str | None] = {
-            "ticker": ticker.upper(),
-            "sector": fundament.get("Sector"),
-            "industry": fundament.get("Industry"),
-            "country": fundament.get("Country"),
-        }
-        for field, (col, parser) in COMMON_FIELD_MAP.items():
-            value = fundament.get(field)
-            row[col] = parser(value)
-        for field, (price_col, distance_col) in HIGH_LOW_FIELDS.items():
-            price, pct = parse_high_low(fundament.get(field))
-            row[price_col] = price
-            row[distance_col] = pct
-        rows.append(row)
-    df = pd.DataFrame(rows)
+def _fetch_raw(ticker: str) -> Dict[str, str | None] | None:
+    """Fetch unparsed Finviz strings for one ticker, keyed by output column.
+
+    52-week fields keep the combined "price pct" string under the price
+    column; `_parse_columns` splits it out. Returns None if the fetch fails.
+    """
+    try:
+        fundament = finvizfinance(ticker).ticker_fundament()
+    except Exception as err:
+        print(f"Failed to fetch {ticker}: {err}", file=sys.stderr)
+        return None
+    get = fundament.get
+    row: Dict[str, str | None] = {
+        "ticker": ticker.upper(),
+        "sector": get("Sector"),
+        "industry": get("Industry"),
+        "country": get("Country"),
+    }
+    for field, col, _ in _FIELD_ITEMS:
+        row[col] = get(field)
+    for field, price_col, distance_col in _HL_ITEMS:
+        row[price_col] = get(field)
+        row[distance_col] = None
+    return row
+
+
+def _to_numeric(series: pd.Series, *, percent: bool = False) -> pd.Series:
+    text = series.astype(str).str.strip()
+    text = text.where(~text.isin(_NA_TOKENS))
+    if percent:
+        text = text.str.rstrip("%")
+    text = text.str.replace(",", "", regex=False)
+    # NA tokens are masked above; any other unparseable text is coerced to NaN.
+    # Cast explicitly: all-integer columns would otherwise come back as int64.
+    return pd.to_numeric(text, errors="coerce").astype("float64")
+
+
+def _parse_columns(raw_df: pd.DataFrame) -> pd.DataFrame:
+    df = raw_df.copy()
+    for _, col, kind in _FIELD_ITEMS:
+        df[col] = _to_numeric(raw_df[col], percent=kind == PERCENT)
+    for _, price_col, distance_col in _HL_ITEMS:
+        parts = raw_df[price_col].astype(str).str.strip().str.split(n=1, expand=True)
+        parts = parts.reindex(columns=[0, 1])
+        df[price_col] = _to_numeric(parts[0])
+        df[distance_col] = _to_numeric(parts[1], percent=True)
+    return df
+
+
+def collect_quote_features(tickers: Iterable[str], max_workers: int = MAX_WORKERS) -> pd.DataFrame:
+    """Fetch and parse quotes; tickers that failed are listed in ``df.attrs["failed_tickers"]``.
+
+    Failed tickers still get a row, with every feature missing.
+    """
+    raw_rows = []
+    failed = []
+    # Requests are network-bound, so overlap them; `map` preserves input order. The pool
+    # only spawns threads as work arrives, and generators start fetching as they are read.
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        for ticker, row in executor.map(lambda t: (t, _fetch_raw(t)), tickers):
+            if row is None:
+                failed.append(ticker.upper())
+                row = _empty_row(ticker)
+            raw_rows.append(row)
+    df = _parse_columns(pd.DataFrame(raw_rows))
+    # float32 keeps ~7 significant digits: exact for Finviz ratios and percents, but
+    # prices above ~100k lose their cents (736,512.37 is stored as 736512.4).
+    df[_NUMERIC_COLUMNS] = df[_NUMERIC_COLUMNS].astype("float32")
     df.insert(1, "snapshot_utc", datetime.now(timezone.utc).isoformat())
+    df.attrs["failed_tickers"] = failed
     return df
 
 
+def write_snapshot(df: pd.DataFrame, csv_path: Path) -> Path:
+    """Write `df` to `csv_path` plus a sibling Parquet file; return the Parquet path.
+
+    float32 columns map to Arrow float, so Parquet stores FLOAT rather than DOUBLE.
+    """
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    # quoting_style="none" would match the old layout but raises on industries
+    # containing commas, so the default quoting is kept.
+    pac.write_csv(table, csv_path)
+    parquet_path = csv_path.with_suffix(".parquet")
+    pq.write_table(table, parquet_path, compression="zstd")
+    return parquet_path
+
+
 # CLI -----------------------------------------------------------------------
 
 
+def iter_tickers_file(path: Path) -> Iterator[str]:
+    """Yield tickers from a file with one or more comma-separated tickers per line."""
+    with path.open("rb") as fp:
+        if path.stat().st_size == 0:
+            return
+        with mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            # utf-8-sig drops a leading BOM so it is not glued to the first ticker.
+            lines = (line.decode("utf-8-sig") for line in iter(mm.readline, b""))
+            for fields in csv.reader(lines):
+                for field in fields:
+                    ticker = field.strip().upper()
+                    if ticker:
+                        yield ticker
+
+
 def parse_args() -> argparse.Namespace:
     parser = argparse.ArgumentParser(description="Collect cleaned Finviz features")
     parser.add_argument(
@@ -137,6 +259,11 @@ def parse_args() -> argparse.Namespace:
         default="AAPL,MSFT,TSLA",
         help="Comma-separated tickers to fetch (default: AAPL,MSFT,TSLA)",
     )
+    parser.add_argument(
+        "--tickers-file",
+        type=Path,
+        help="File of tickers, one or more comma-separated per line (overrides --tickers)",
+    )
     parser.add_argument(
         "--output-dir",
         default="data_cache/finviz",
@@ -147,30 +274,54 @@ def parse_args() -> argparse.Namespace:
         action="store_true",
         help="Persist the cleaned records to a JSON file alongside the CSV",
     )
-    return parser.parse_args()
+    parser.add_argument(
+        "--max-workers",
+        type=int,
+        default=MAX_WORKERS,
+        help=f"Concurrent Finviz requests (default: {MAX_WORKERS})",
+    )
+    args = parser.parse_args()
+    if args.tickers_file:
+        try:
+            args.tickers_file.open("rb").close()
+        except OSError as err:
+            parser.error(f"cannot read --tickers-file {args.tickers_file}: {err.strerror}")
+    return args
 
 
 def main() -> None:
     args = parse_args()
-    tickers = [t.strip().upper() for t in args.tickers.split(",") if t.strip()]
-    if not tickers:
+    if args.tickers_file:
+        tickers: Iterator[str] = iter_tickers_file(args.tickers_file)
+    else:
+        tickers = (t.strip().upper() for t in args.tickers.split(","))
+        tickers = (t for t in tickers if t)
+    first = next(tickers, None)
+    if first is None:
         raise SystemExit("No tickers provided")
+    tickers = itertools.chain([first], tickers)
 
-    df = collect_quote_features(tickers)
+    df = collect_quote_features(tickers, max_workers=args.max_workers)
 
     output_base = Path(args.output_dir)
     output_base.mkdir(parents=True, exist_ok=True)
     timestamp = datetime.now(timezone.utc).strftime("%Y%m%d%H%M%S")
     csv_path = output_base / f"quotes_features_{timestamp}.csv"
-    df.to_csv(csv_path, index=False)
+    parquet_path = write_snapshot(df, csv_path)
 
     if args.dump_raw:
         json_path = output_base / f"quotes_features_{timestamp}.json"
-        json_path.write_text(json.dumps(df.to_dict(orient="records"), indent=2))
+        # Keep NumPy scalars so orjson prints float32 values at float32 precision.
+        columns = [df[col].to_numpy() for col in df.columns]
+        records = [dict(zip(df.columns, values)) for values in zip(*columns)]
+        json_path.write_bytes(orjson.dumps(records, option=orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY))
 
-    print(f"Saved {len(df)} rows to {csv_path}")
+    print(f"Saved {len(df)} rows to {csv_path} and {parquet_path}")
     if args.dump_raw:
         print(f"Raw JSON written to {json_path}")
+    failed = df.attrs.get("failed_tickers", [])
+    if failed:
+        print(f"Failed to fetch {len(failed)} of {len(df)} tickers; their rows are empty", file=sys.stderr)
 
 
 if __name__ == "__main__":